@@ -1,22 +1,67 @@
 #!/usr/bin/env python3
 import speech_recognition as sr
 import os
+import sys
 import time
 import argparse
+from array import array
+import queue
 import threading
-from collections import deque
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import islice
 import json
 import re
+from bisect import bisect_right
 
 # (ทางเลือก) Thai NLP
 try:
-    from pythainlp import word_tokenize
-    from pythainlp.tokenize import sent_tokenize
+    from pythainlp.tokenize import Tokenizer, sent_tokenize
+    # สร้างตัวตัดคำ newmm ครั้งเดียวแล้วใช้ซ้ำ (ข้าม dispatch ของ word_tokenize ทุกครั้ง)
+    THAI_TOKENIZER = Tokenizer(engine="newmm", keep_whitespace=False)
     HAS_THAI = True
 except Exception:
     HAS_THAI = False
 
+# (ทางเลือก) Aho-Corasick สำหรับจับ trigger หลายคำในรอบเดียว
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except Exception:
+    HAS_AHOCORASICK = False
+
+# (ทางเลือก) Hyperscan: trigger + assignee + due ทั้งหมดเป็น DFA เดียว (สำหรับประชุมยาว/หลาย session)
+try:
+    import hyperscan
+    HAS_HYPERSCAN = True
+except Exception:
+    HAS_HYPERSCAN = False
+
+# (ทางเลือก) orjson สำหรับเขียน/อ่าน JSON ที่เร็วกว่า stdlib
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+# (ทางเลือก) httpx: ใช้ connection ไป Google STT ซ้ำ (keep-alive) แทนการเปิดใหม่ทุกประโยค
+try:
+    import httpx
+    HAS_HTTPX = True
+except Exception:
+    HAS_HTTPX = False
+
+# (ทางเลือก) h2: ให้ httpx คุยกับ Google STT แบบ HTTP/2 (pip install httpx[http2])
+try:
+    import h2
+    HAS_HTTP2 = True
+except Exception:
+    HAS_HTTP2 = False
+
+# endpoint เดียวกับที่ recognize_google ของ SpeechRecognition ใช้ แต่ผ่าน https
+GOOGLE_STT_ENDPOINT = "https://www.google.com/speech-api/v2/recognize"
+
 # (ทางเลือก) Gemini LLM
 try:
     import google.generativeai as genai
@@ -32,12 +77,35 @@ class ThaiMeetingSummarizer:
     - ดึงการตัดสินใจ (decisions) จากประโยค trigger
     - ดึง Action items (assignee, task, due) แบบ heuristic
     - ดึงความเสี่ยง/ติดตาม (risks_or_followups)
+
+    สถานะสรุปถูกอัปเดตแบบ incremental เฉพาะ utterance ใหม่ในแต่ละรอบ
+    ถ้ากำหนด window_seconds จะสรุปเฉพาะช่วง W วินาทีล่าสุด (sliding window)
     """
-    def __init__(self, language="th-TH"):
+    _FALLBACK_SENT_RE = re.compile(r"[\.!\?\n]|[ ]{2,}|[|]")
+    _WHITESPACE_RE = re.compile(r"\s+")
+    _HAS_THAI_RE = re.compile(r"[\u0E00-\u0E7F]")
+
+    def __init__(self, language="th-TH", window_seconds=None):
         self.language = language
+        self.window_seconds = window_seconds
         self.utterances = []  # list of (timestamp, text)
 
-        self.topic_stopwords = set([
+        # ตัดคำ/ตัดประโยคบน worker ตั้งแต่ข้อความเข้ามา ไม่ให้ไปหน่วงรอบสรุป
+        # (worker เดียว: ผลออกตามลำดับ utterance)
+        self._tok_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thai-tokenizer")
+        self._tok_futures = deque()
+
+        # สถานะสรุปแบบ incremental
+        self._summ_cursor = 0    # utterance ถัดไปที่ยังไม่ได้ประมวลผล
+        self._window_start = 0   # utterance แรกที่ยังอยู่ใน window
+        self._topic_counter = Counter()
+        self._decisions = deque()
+        self._actions = deque()
+        self._risks = deque()
+        self._highlights = deque()
+        self._contrib = deque()  # (ts, topic_words, n_decisions, n_actions, n_risks, n_highlights) ต่อ utterance
+
+        self.topic_stopwords = frozenset([
             "ครับ","ค่ะ","คะ","เรา","เขา","ที่","ว่า","และ","หรือ","ก็","คือ","มัน","ได้","ๆ","นะ","ค่ะ","ครับ",
             "เอ่อ","อ่า","แบบว่า","คือว่า","ก็คือ","แบบ"
         ])
@@ -58,112 +126,268 @@ class ThaiMeetingSummarizer:
             r"(ภายใน\s*สัปดาห์นี้|ภายใน\s*เดือนนี้|สิ้นเดือนนี้|สัปดาห์หน้า|เดือนหน้า)"
         ]
 
+        # คอมไพล์ regex ครั้งเดียว: รวม trigger/pattern ของแต่ละหมวดเป็น alternation เดียว
+        self.decision_re = self._compile_triggers(self.decision_triggers)
+        self.action_re = self._compile_triggers(self.action_triggers)
+        self.risk_re = self._compile_triggers(self.risk_triggers)
+        self.decision_action_re = self._compile_triggers(self.decision_triggers + self.action_triggers)
+        self.assignee_re = self._compile_patterns(self.assignee_patterns)
+        self.due_re = self._compile_patterns(self.due_patterns)
+        self.trigger_automaton = self._build_trigger_automaton() if HAS_AHOCORASICK else None
+        self.hyperscan_db = None
+        if HAS_HYPERSCAN:
+            self.hyperscan_db, self._hs_kinds = self._build_hyperscan_db()
+
+        # Gemini: ตั้งค่าและสร้างโมเดลครั้งเดียว (ไม่มี key = ใช้สรุปออฟไลน์อย่างเดียว)
+        self._gemini_model = None
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if HAS_GEMINI and api_key:
+            genai.configure(api_key=api_key)
+            self._gemini_model = genai.GenerativeModel(
+                "gemini-1.5-flash",
+                generation_config={
+                    "temperature": 0.2,
+                    "top_p": 0.9,
+                    "max_output_tokens": 2048,
+                    "response_mime_type": "application/json",
+                },
+            )
+
+    @staticmethod
+    def _compile_triggers(triggers):
+        return re.compile("|".join(map(re.escape, triggers)))
+
+    @staticmethod
+    def _compile_patterns(patterns):
+        return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+    def _build_trigger_automaton(self):
+        # trigger หนึ่งคำอาจอยู่ได้หลายหมวด จึงเก็บค่าเป็น frozenset ของหมวด
+        categories = {}
+        for cat, triggers in (("decision", self.decision_triggers),
+                              ("action", self.action_triggers),
+                              ("risk", self.risk_triggers)):
+            for t in triggers:
+                categories.setdefault(t, set()).add(cat)
+        automaton = ahocorasick.Automaton()
+        for t, cats in categories.items():
+            automaton.add_word(t, frozenset(cats))
+        automaton.make_automaton()
+        return automaton
+
+    def _build_hyperscan_db(self):
+        # pattern id -> ชนิด ("decision"/"action"/"risk"/"assignee"/"due")
+        kinds, expressions, flags = [], [], []
+        base = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        for cat, triggers in (("decision", self.decision_triggers),
+                              ("action", self.action_triggers),
+                              ("risk", self.risk_triggers)):
+            for t in triggers:
+                kinds.append(cat)
+                expressions.append(re.escape(t).encode("utf-8"))
+                flags.append(base)
+        # assignee/due ต้องใช้ข้อความที่ match จึงขอตำแหน่งเริ่ม (SOM) ด้วย
+        for kind, patterns in (("assignee", self.assignee_patterns), ("due", self.due_patterns)):
+            for p in patterns:
+                kinds.append(kind)
+                expressions.append(p.encode("utf-8"))
+                flags.append(base | hyperscan.HS_FLAG_SOM_LEFTMOST)
+        db = hyperscan.Database()
+        db.compile(expressions=expressions, ids=list(range(len(expressions))),
+                   elements=len(expressions), flags=flags)
+        return db, kinds
+
+    def _hyperscan_scan(self, sentences):
+        """สแกนทุกประโยคด้วย Hyperscan รอบเดียว คืน (หมวด trigger, assignee, due) ต่อประโยค"""
+        encoded = [sent.encode("utf-8") for sent in sentences]
+        starts, ends = [], []
+        pos = 0
+        for b in encoded:
+            starts.append(pos)
+            pos += len(b)
+            ends.append(pos)
+            pos += 1  # "\n"
+        joined = b"\n".join(encoded)
+        cats = [set() for _ in sentences]
+        spans = {}  # (ประโยค, "assignee"/"due") -> (start, end) ที่ซ้ายสุดและยาวสุด
+        kinds = self._hs_kinds
+
+        def on_match(pattern_id, start, end, flags, context):
+            kind = kinds[pattern_id]
+            if kind in ("assignee", "due"):
+                i = bisect_right(starts, start) - 1
+                if end > ends[i]:
+                    return  # ข้าม "\n" ไปประโยคถัดไป (เช่นผ่าน \s*) ไม่นับ
+                best = spans.get((i, kind))
+                if best is None or start < best[0] or (start == best[0] and end > best[1]):
+                    spans[(i, kind)] = (start, end)
+            else:
+                # trigger ไม่ได้ขอ SOM จึงใช้ตำแหน่งท้ายหาประโยคเจ้าของ
+                cats[bisect_right(starts, end - 1) - 1].add(kind)
+
+        self.hyperscan_db.scan(joined, match_event_handler=on_match)
+
+        results = []
+        for i, sent_cats in enumerate(cats):
+            found = []
+            for kind in ("assignee", "due"):
+                span = spans.get((i, kind))
+                found.append(joined[span[0]:span[1]].decode("utf-8") if span else "ไม่ระบุ")
+            results.append((sent_cats, *found))
+        return results
+
+    def _scan_sentences(self, sentences):
+        """(หมวด trigger, assignee, due) ของแต่ละประโยค; assignee/due เป็น None = ยังไม่ได้หา"""
+        if self.hyperscan_db is not None and sentences:
+            return self._hyperscan_scan(sentences)
+        return [(cats, None, None) for cats in self._trigger_categories(sentences)]
+
+    def _trigger_categories(self, sentences):
+        """
+        หมวด trigger ("decision", "action", "risk") ที่พบในแต่ละประโยค
+        สแกนทั้งชุดในรอบเดียวโดยต่อประโยคด้วย "\n" (trigger ไม่มี "\n" จึงไม่ข้ามประโยค)
+        แล้วคืนผลให้ประโยคเจ้าของตาม offset
+        """
+        found = [set() for _ in sentences]
+        if not sentences:
+            return found
+        joined = "\n".join(sentences)
+        starts = [0]
+        for sent in sentences[:-1]:
+            starts.append(starts[-1] + len(sent) + 1)
+
+        if self.trigger_automaton is not None:
+            for end, cats in self.trigger_automaton.iter(joined):
+                found[bisect_right(starts, end) - 1] |= cats
+        else:
+            for cat, rx in (("decision", self.decision_re),
+                            ("action", self.action_re),
+                            ("risk", self.risk_re)):
+                for m in rx.finditer(joined):
+                    found[bisect_right(starts, m.start()) - 1].add(cat)
+        return found
+
     def add_utterance(self, ts, text):
+        # ต้องใส่ future ก่อน utterance เพื่อให้รอบสรุปเห็นคู่กันเสมอ
+        self._tok_futures.append(self._tok_executor.submit(self._tokenize, text))
         self.utterances.append((ts, text))
 
+    def _tokenize(self, text):
+        words = [w for w in self._thai_words(text) if len(w) >= 2 and w not in self.topic_stopwords]
+        return words, self._thai_sentences(text)
+
     def _thai_sentences(self, text):
-        if HAS_THAI:
+        # ข้อความที่ไม่มีอักษรไทยเลย ไม่ต้องเรียกตัวตัดประโยค (CRF) ของ PyThaiNLP
+        if HAS_THAI and self._HAS_THAI_RE.search(text):
             try:
                 return [s.strip() for s in sent_tokenize(text) if s.strip()]
             except Exception:
                 pass
         # fallback
-        parts = re.split(r"[\.!\?\n]|[ ]{2,}|[|]", text)
+        parts = self._FALLBACK_SENT_RE.split(text)
         return [p.strip() for p in parts if p.strip()]
 
     def _thai_words(self, text):
-        if HAS_THAI:
+        if HAS_THAI and self._HAS_THAI_RE.search(text):
             try:
-                return [w for w in word_tokenize(text) if w.strip()]
+                return [w for w in THAI_TOKENIZER.word_tokenize(text) if w.strip()]
             except Exception:
                 pass
         # fallback: แยกด้วยช่องว่าง
-        return [w for w in re.split(r"\s+", text) if w.strip()]
-
-    def _extract_topics(self, all_text, topn=5):
-        words = self._thai_words(all_text)
-        freq = {}
-        for w in words:
-            if w in self.topic_stopwords:
-                continue
-            if len(w) < 2:
-                continue
-            freq[w] = freq.get(w, 0) + 1
-        topics = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:topn]
-        return [t[0] for t in topics]
-
-    def _match_any(self, text, triggers):
-        return any(t in text for t in triggers)
+        return [w for w in self._WHITESPACE_RE.split(text) if w.strip()]
 
     def _extract_assignee(self, sentence):
-        for pat in self.assignee_patterns:
-            m = re.search(pat, sentence)
-            if m:
-                return m.group(1)
-        return "ไม่ระบุ"
+        m = self.assignee_re.search(sentence)
+        return m.group(0) if m else "ไม่ระบุ"
 
     def _extract_due(self, sentence):
-        for pat in self.due_patterns:
-            m = re.search(pat, sentence)
-            if m:
-                return m.group(1)
-        return "ไม่ระบุ"
+        m = self.due_re.search(sentence)
+        return m.group(0) if m else "ไม่ระบุ"
 
-    def summarize_offline(self):
-        # รวมข้อความทั้งหมด
-        all_text = "\n".join([t for _, t in self.utterances]).strip()
-        topics = self._extract_topics(all_text, topn=6)
-
-        decisions = []
-        action_items = []
-        risks = []
-        highlights = []
-
-        # ประมวลผลทีละประโยค
-        for ts, text in self.utterances:
-            for sent in self._thai_sentences(text):
-                if self._match_any(sent, self.decision_triggers):
-                    decisions.append(sent)
-                if self._match_any(sent, self.action_triggers):
-                    action_items.append({
-                        "assignee": self._extract_assignee(sent),
-                        "task": sent,
-                        "due": self._extract_due(sent)
-                    })
-                if self._match_any(sent, self.risk_triggers):
-                    risks.append(sent)
-
-        # ไฮไลต์: เลือกประโยคยาว/มีคำสำคัญ
-        for ts, text in self.utterances:
-            if len(text) >= 25 and (self._match_any(text, self.decision_triggers + self.action_triggers) or len(text) > 60):
-                highlights.append(text)
-        highlights = highlights[:8]
+    def _ingest(self, ts, text, words, sentences, scans):
+        """ประมวลผล utterance ใหม่หนึ่งรายการ (ตัดคำและสแกนประโยคแล้ว) เข้าสถานะสรุป"""
+        self._topic_counter.update(words)
 
+        n_decisions = n_actions = n_risks = 0
+        for sent, (cats, assignee, due) in zip(sentences, scans):
+            if not cats:
+                continue
+            if "decision" in cats:
+                self._decisions.append(sent)
+                n_decisions += 1
+            if "action" in cats:
+                self._actions.append({
+                    "assignee": assignee or self._extract_assignee(sent),
+                    "task": sent,
+                    "due": due or self._extract_due(sent)
+                })
+                n_actions += 1
+            if "risk" in cats:
+                self._risks.append(sent)
+                n_risks += 1
+
+        # ไฮไลต์: เลือกประโยคยาว/มีคำสำคัญ (ไม่มี window แล้วได้ครบ 8 ก็ไม่ต้องเก็บต่อ)
+        n_highlights = 0
+        if (len(text) >= 25 and (self.window_seconds or len(self._highlights) < 8)
+                and (len(text) > 60 or self.decision_action_re.search(text) is not None)):
+            self._highlights.append(text)
+            n_highlights = 1
+
+        if self.window_seconds:
+            self._contrib.append((ts, words, n_decisions, n_actions, n_risks, n_highlights))
+
+    def _expire(self, contrib):
+        """ลบผลของ utterance ที่หลุดออกจาก window (เก่าสุดเสมอ จึง pop จากด้านหน้า)"""
+        _, words, n_decisions, n_actions, n_risks, n_highlights = contrib
+        for w in words:
+            self._topic_counter[w] -= 1
+            if self._topic_counter[w] <= 0:
+                del self._topic_counter[w]
+        for items, n in ((self._decisions, n_decisions), (self._actions, n_actions),
+                         (self._risks, n_risks), (self._highlights, n_highlights)):
+            for _ in range(n):
+                items.popleft()
+        self._window_start += 1
+
+    def _update_state(self):
+        # utterance ใหม่ทั้งหมดตั้งแต่รอบก่อนถูกสแกน trigger เป็นชุดเดียว
+        utterances = self.utterances
+        batch = []
+        while self._summ_cursor < len(utterances):
+            ts, text = utterances[self._summ_cursor]
+            words, sentences = self._tok_futures.popleft().result()
+            self._summ_cursor += 1
+            batch.append((ts, text, words, sentences))
+
+        all_scans = self._scan_sentences([sent for *_, sentences in batch for sent in sentences])
+        pos = 0
+        for ts, text, words, sentences in batch:
+            self._ingest(ts, text, words, sentences, all_scans[pos:pos + len(sentences)])
+            pos += len(sentences)
+
+        if self.window_seconds and self._contrib:
+            horizon = self._contrib[-1][0] - self.window_seconds
+            while self._contrib and self._contrib[0][0] < horizon:
+                self._expire(self._contrib.popleft())
+
+    def summarize_offline(self):
+        self._update_state()
         summary = {
             "summary": "สรุปอัตโนมัติแบบออฟไลน์ (heuristic) จากการสนทนา",
-            "topics": topics,
-            "decisions": decisions[:10],
-            "action_items": action_items[:20],
-            "risks_or_followups": risks[:10],
-            "highlights": highlights
+            "topics": [w for w, _ in self._topic_counter.most_common(6)],
+            "decisions": list(islice(self._decisions, 10)),
+            "action_items": list(islice(self._actions, 20)),
+            "risks_or_followups": list(islice(self._risks, 10)),
+            "highlights": list(islice(self._highlights, 8))
         }
         return summary
 
     def summarize_with_gemini(self):
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        if not (HAS_GEMINI and api_key):
+        if self._gemini_model is None:
             return None
-        genai.configure(api_key==api_key)
-        model = genai.GenerativeModel(
-            "gemini-1.5-flash",
-            generation_config={
-                "temperature": 0.2,
-                "top_p": 0.9,
-                "max_output_tokens": 2048,
-                "response_mime_type": "application/json",
-            },
-        )
-        all_text = "\n".join([t for _, t in self.utterances]).strip()
+        self._update_state()
+        # transcript เต็มต้องใช้เฉพาะ prompt ของ Gemini (สรุปออฟไลน์ใช้สถานะ incremental)
+        all_text = "\n".join(t for _, t in islice(self.utterances, self._window_start, None)).strip()
         prompt = (
             "คุณเป็นเลขานุการการประชุม ช่วยสรุปข้อความต่อไปนี้เป็นภาษาไทย "
             "และส่งคืน JSON กับคีย์: summary, topics, decisions, "
@@ -172,8 +396,8 @@ class ThaiMeetingSummarizer:
             f"{all_text}"
         )
         try:
-            resp = model.generate_content(prompt)
-            data = json.loads(resp.text)
+            resp = self._gemini_model.generate_content(prompt)
+            data = orjson.loads(resp.text) if HAS_ORJSON else json.loads(resp.text)
             return data
         except Exception:
             return None
@@ -194,7 +418,8 @@ class RealTimeAugmenter:
     def __init__(self,
                  language="th-TH",
                  mic_index=None,
-                 summarize_interval=30):
+                 summarize_interval=30,
+                 summary_window=None):
         # การตั้งค่า
         self.language = language
         self.mic_index = mic_index
@@ -202,9 +427,12 @@ class RealTimeAugmenter:
 
         # สถานะที่เกี่ยวข้องกับการแสดงผล
         self.live_transcript = deque(maxlen=5)
-        self.lock = threading.Lock()
-        self.all_utterances = []  # list of (ts, text)
-        self.last_text = None
+        # transcript ทั้งหมดแบบ SoA: timestamp (double) กับข้อความแยกกัน index เดียวกัน
+        self._ts = array('d')
+        self._texts = []
+        self._recent_norms = deque(maxlen=8)  # ข้อความล่าสุดแบบ normalize (ตัวเล็ก, ไม่มีช่องว่าง)
+        # callback ของ STT แค่ส่งผลเข้าคิว (ไม่ล็อก) ลูปหลักเป็นผู้อ่านและแก้ไขสถานะทั้งหมด
+        self._stt_queue = queue.SimpleQueue()  # (ts, text) หรือ (None, ข้อความแจ้งข้อผิดพลาด)
 
         # STT
         self.recognizer = sr.Recognizer()
@@ -212,11 +440,27 @@ class RealTimeAugmenter:
         self.recognizer.pause_threshold = 0.6
         self.recognizer.non_speaking_duration = 0.4
         self.google_key = os.environ.get("GOOGLE_SPEECH_RECOGNITION_API_KEY")
+        # HTTP client ตัวเดียวตลอดการประชุม (callback ถูกเรียกทีละครั้งจาก thread ของ listener)
+        # ใช้เฉพาะเมื่อตั้ง key ไว้ ถ้าไม่ตั้งจะใช้ recognize_google ซึ่งมี key สาธารณะของไลบรารีเอง
+        self._http = None
+        if HAS_HTTPX and self.google_key:
+            self._http = httpx.Client(http2=HAS_HTTP2, timeout=10, limits=httpx.Limits(max_keepalive_connections=2))
 
         # Summarizer
-        self.summarizer = ThaiMeetingSummarizer(language=self.language)
+        self.summarizer = ThaiMeetingSummarizer(language=self.language, window_seconds=summary_window)
         self.last_summary_time = 0
         self.live_summary_cache = None
+        # สรุปบน worker แยก (Gemini อาจใช้เวลาหลายวินาที) ลูปหลักแค่ส่งสัญญาณขอสรุป
+        # คำขอที่ซ้อนกันระหว่างที่ worker ยังทำงานจะรวมเป็นครั้งเดียว
+        self._summary_request_evt = threading.Event()
+        self._summary_lock = threading.Lock()
+        threading.Thread(target=self._summary_worker, daemon=True).start()
+
+        # UI: สถานะของเฟรมที่วาดล่าสุด
+        self._rendered_transcript = None
+        self._rendered_summary = None
+        if os.name == 'nt':
+            os.system("")  # เปิดโหมด ANSI (VT100) ของ Windows console
 
         # Output
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -228,81 +472,157 @@ class RealTimeAugmenter:
         self.out_summary_txt = os.path.join(self.out_dir, f"{self.base_name}.summary.txt")
 
     # ---------- UI ----------
-    def _clear_screen(self):
-        os.system('cls' if os.name == 'nt' else 'clear')
-
     def _display_dashboard(self):
-        self._clear_screen()
-        print("="*70)
-        print("--- 🚀 Real-time Meeting Summarizer (Google STT) 🚀 ---")
-        print("สถานะ: กำลังรับฟัง... (กด Ctrl+C เพื่อหยุด)")
-        print("="*70)
+        # วาดใหม่เฉพาะเมื่อ transcript หรือสรุปเปลี่ยน
+        transcript = tuple(self.live_transcript)
+        summary = self.live_summary_cache
+        if transcript == self._rendered_transcript and summary is self._rendered_summary:
+            return
+        self._rendered_transcript = transcript
+        self._rendered_summary = summary
+
+        lines = [
+            "="*70,
+            "--- 🚀 Real-time Meeting Summarizer (Google STT) 🚀 ---",
+            "สถานะ: กำลังรับฟัง... (กด Ctrl+C เพื่อหยุด)",
+            "="*70,
+        ]
 
         # Live transcript
-        print("\n📜 Live Transcript:")
-        with self.lock:
-            if not self.live_transcript:
-                print("   ...")
-            else:
-                for t in self.live_transcript:
-                    print(f"   - {t}")
+        lines += ["", "📜 Live Transcript:"]
+        if not transcript:
+            lines.append("   ...")
+        else:
+            for t in transcript:
+                lines.append(f"   - {t}")
 
         # Live summary (cache)
-        print("\n🧭 Live Meeting Summary (ล่าสุด):")
-        if self.live_summary_cache:
-            s = self.live_summary_cache
-            topics = ", ".join(s.get("topics", [])[:5]) or "-"
-            decisions_n = len(s.get("decisions", []))
-            actions_n = len(s.get("action_items", []))
-            risks_n = len(s.get("risks_or_followups", []))
-            print(f"   • หัวข้อหลัก: {topics}")
-            print(f"   • การตัดสินใจ: {decisions_n} รายการ")
-            print(f"   • Action items: {actions_n} รายการ")
-            print(f"   • ความเสี่ยง/ติดตาม: {risks_n} รายการ")
+        lines += ["", "🧭 Live Meeting Summary (ล่าสุด):"]
+        if summary:
+            topics = ", ".join(summary.get("topics", [])[:5]) or "-"
+            decisions_n = len(summary.get("decisions", []))
+            actions_n = len(summary.get("action_items", []))
+            risks_n = len(summary.get("risks_or_followups", []))
+            lines.append(f"   • หัวข้อหลัก: {topics}")
+            lines.append(f"   • การตัดสินใจ: {decisions_n} รายการ")
+            lines.append(f"   • Action items: {actions_n} รายการ")
+            lines.append(f"   • ความเสี่ยง/ติดตาม: {risks_n} รายการ")
         else:
-            print("   ...")
+            lines.append("   ...")
+
+        lines += ["", "-"*70]
 
-        print("\n" + "-"*70)
+        # ANSI: กลับไปมุมซ้ายบน, เขียนทับทีละบรรทัด (ล้างท้ายบรรทัด) แล้วล้างส่วนที่เหลือของจอ
+        # แทนการเรียก cls/clear ซึ่งต้อง fork process ทุกเฟรม
+        sys.stdout.write("\x1b[H" + "".join(f"{line}\x1b[K\n" for line in lines) + "\x1b[J")
+        sys.stdout.flush()
 
     # ---------- Processing ----------
-    def _process_text(self, text):
+    def _process_text(self, ts, text):
         text = text.strip()
         if not text:
             return
-        # กันข้อความซ้ำติดๆ กัน
-        if self.last_text and text == self.last_text:
+        # transcript เก็บทุกผลที่ได้จาก STT เสมอ (ไฟล์บันทึกการประชุมต้องครบ)
+        self.live_transcript.append(text)
+        self._ts.append(ts)
+        self._texts.append(text)
+
+        # กรองเฉพาะงานสรุป: STT มักส่งผลที่ซ้อนทับกัน ("ผมจะไป" แล้ว "ผมจะไปประชุม")
+        # ข้อความที่ซ้ำ เป็นท่อนต้น หรือเป็นส่วนขยายของข้อความล่าสุด ไม่ต้องตัดคำ/นับหัวข้อซ้ำอีกรอบ
+        norm = "".join(text.lower().split())
+        if any(norm.startswith(prev) or prev.startswith(norm) for prev in self._recent_norms):
             return
-        self.last_text = text
+        self._recent_norms.append(norm)
+        self.summarizer.add_utterance(ts, text)
 
-        now = time.time()
-        with self.lock:
-            self.live_transcript.append(text)
-            self.all_utterances.append((now, text))
-            self.summarizer.add_utterance(now, text)
+    def _drain_stt_queue(self):
+        while True:
+            try:
+                ts, text = self._stt_queue.get_nowait()
+            except queue.Empty:
+                return
+            if ts is None:
+                # แสดงเป็นบรรทัดแจ้งเตือนใน transcript เพื่อให้เห็นในหน้าจอ
+                self.live_transcript.append(text)
+            else:
+                self._process_text(ts, text)
 
     # ---------- Callback ----------
+    def _prewarm_http(self):
+        # เปิด connection ไว้ล่วงหน้าระหว่างตั้งค่าไมค์ ประโยคแรกจะได้ไม่ต้องรอ TCP/TLS handshake
+        try:
+            self._http.head(GOOGLE_STT_ENDPOINT)
+        except Exception:
+            pass
+
+    def _recognize_google(self, audio):
+        # คำขอ/คำตอบรูปแบบเดียวกับ recognize_google แต่ส่งผ่าน connection เดิม
+        # สำเนาเดียวกับ Sp-wordCheck/augmenter.py::_recognize_google แก้ที่หนึ่งต้องแก้อีกที่ด้วย
+        flac_data = audio.get_flac_data(
+            convert_rate=None if audio.sample_rate >= 8000 else 8000,
+            convert_width=2  # ต้องเป็น 16-bit
+        )
+        try:
+            response = self._http.post(
+                GOOGLE_STT_ENDPOINT,
+                params={"client": "chromium", "lang": self.language, "key": self.google_key, "pFilter": 0},
+                headers={"Content-Type": f"audio/x-flac; rate={audio.sample_rate}"},
+                content=flac_data,
+            )
+        except (httpx.HTTPError, RuntimeError) as e:  # RuntimeError: client ถูกปิดไปแล้วตอนหยุดโปรแกรม
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        if response.status_code != 200:
+            raise sr.RequestError(f"recognition request failed: {response.reason_phrase}")
+
+        # คำตอบเป็น JSON ทีละบรรทัด บรรทัดแรกมักเป็น {"result":[]} ว่างๆ
+        for line in response.text.split("\n"):
+            if not line:
+                continue
+            result = json.loads(line)["result"]
+            if result:
+                alternatives = result[0].get("alternative")
+                if not alternatives or "transcript" not in alternatives[0]:
+                    raise sr.UnknownValueError()
+                return alternatives[0]["transcript"]
+        raise sr.UnknownValueError()
+
     def _audio_callback(self, recognizer, audio):
         try:
-            result = recognizer.recognize_google(audio, language=self.language, key=self.google_key)
-            self._process_text(result)
+            if self._http is not None:
+                result = self._recognize_google(audio)
+            else:
+                result = recognizer.recognize_google(audio, language=self.language, key=self.google_key)
+            self._stt_queue.put_nowait((time.time(), result))
         except sr.UnknownValueError:
             pass
         except sr.RequestError as e:
-            with self.lock:
-                # แสดงเป็นบรรทัดแจ้งเตือนใน transcript เพื่อให้เห็นในหน้าจอ
-                self.live_transcript.append(f"[ข้อผิดพลาดเชื่อมต่อ: {e}]")
+            self._stt_queue.put_nowait((None, f"[ข้อผิดพลาดเชื่อมต่อ: {e}]"))
+
+    # ---------- Summary ----------
+    def _summarize(self):
+        with self._summary_lock:
+            return self.summarizer.summarize(prefer_gemini=True)
+
+    def _summary_worker(self):
+        while True:
+            self._summary_request_evt.wait()
+            self._summary_request_evt.clear()
+            # การกำหนด reference เดียวเป็น atomic ภายใต้ GIL ฝั่งแดชบอร์ดอ่านได้โดยไม่ต้องล็อก
+            self.live_summary_cache = self._summarize()
 
     # ---------- Save ----------
     def _save_results(self, final_summary):
         # Transcript
         with open(self.out_transcript, "w", encoding="utf-8") as f:
-            with self.lock:
-                for ts, text in self.all_utterances:
-                    rel = ts - (self.all_utterances[0][0] if self.all_utterances else ts)
-                    f.write(f"[+{rel:0.1f}s] {text}\n")
+            t0 = self._ts[0] if self._ts else 0.0
+            f.writelines(f"[+{ts - t0:0.1f}s] {text}\n" for ts, text in zip(self._ts, self._texts))
         # Summary JSON
-        with open(self.out_summary_json, "w", encoding="utf-8") as f:
-            json.dump(final_summary, f, ensure_ascii=False, indent=2)
+        if HAS_ORJSON:
+            with open(self.out_summary_json, "wb") as f:
+                f.write(orjson.dumps(final_summary, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        else:
+            with open(self.out_summary_json, "w", encoding="utf-8") as f:
+                json.dump(final_summary, f, ensure_ascii=False, indent=2)
         # Summary TXT (อ่านง่าย)
         lines = []
         lines.append("สรุปการประชุม (อัตโนมัติ)")
@@ -340,6 +660,8 @@ class RealTimeAugmenter:
     # ---------- Run ----------
     def run(self):
         print("กำลังเตรียมไมโครโฟน... กรุณาเงียบสักครู่เพื่อตั้งค่า Ambient Noise")
+        if self._http is not None:
+            threading.Thread(target=self._prewarm_http, daemon=True).start()
         with self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source, duration=2.0)
         print("พร้อมแล้ว! เริ่มพูดได้เลย")
@@ -348,9 +670,11 @@ class RealTimeAugmenter:
 
         try:
             while True:
+                self._drain_stt_queue()
+
                 # อัปเดตสรุปเป็นระยะ
                 if time.time() - self.last_summary_time > self.SUMMARIZE_INTERVAL:
-                    self.live_summary_cache = self.summarizer.summarize(prefer_gemini=True)
+                    self._summary_request_evt.set()
                     self.last_summary_time = time.time()
 
                 self._display_dashboard()
@@ -358,9 +682,12 @@ class RealTimeAugmenter:
         except KeyboardInterrupt:
             print("\nกำลังหยุดการทำงาน...")
             stop_listening(wait_for_stop=False)
+            if self._http is not None:
+                self._http.close()
+            self._drain_stt_queue()
 
             # สรุปครั้งสุดท้าย
-            final_summary = self.summarizer.summarize(prefer_gemini=True)
+            final_summary = self._summarize()
             self._save_results(final_summary)
             print("ปิดโปรแกรมเรียบร้อย ขอบคุณที่ใช้งานครับ!")
 
@@ -376,6 +703,7 @@ def main():
     parser.add_argument("--mic", type=int, default=None, help="index ของไมโครโฟน (ดูจาก --list-mics)")
     parser.add_argument("--list-mics", action="store_true", help="แสดงรายการไมค์และออกจากโปรแกรม")
     parser.add_argument("--summarize-interval", type=int, default=30, help="ความถี่ (วินาที) ในการอัปเดตสรุปบนหน้าจอ")
+    parser.add_argument("--summary-window", type=int, default=0, help="สรุปเฉพาะ N วินาทีล่าสุด (0 = ทั้งการประชุม)")
     args = parser.parse_args()
 
     if args.list_mics:
@@ -385,7 +713,8 @@ def main():
     augmenter = RealTimeAugmenter(
         language=args.language,
         mic_index=args.mic,
-        summarize_interval=args.summarize_interval
+        summarize_interval=args.summarize_interval,
+        summary_window=args.summary_window or None
     )
     augmenter.run()
 
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 import uvicorn
+import asyncio
 import json
 import io
+from functools import lru_cache
 from vosk import Model, KaldiRecognizer
 from pydub import AudioSegment
-from pythainlp.tokenize import word_tokenize
+from pythainlp.tokenize import Tokenizer
 from pythainlp.tag import pos_tag
+from typing import Optional
+
+# Prefer orjson's C parser for recognizer results when it is installed.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # Load the Vosk model once when the server starts.
 # Ensure you have downloaded the Thai model and placed it in a 'model-th' directory.
@@ -17,51 +28,107 @@ except Exception as e:
     model = None
     print(f"❌ Error loading Vosk model: {e}")
 
+# Raw 16 kHz / mono / 16-bit PCM is fed to the recognizer in chunks of this size.
+CHUNK_SIZE = 32768
+
+# Reuse recognizers across requests instead of allocating decoder state per call.
+# LIFO hands out the most recently used (cache-warm) recognizer first.
+# Requests wait for a recognizer on the event loop, never in the threadpool the decodes need.
+RECOGNIZER_POOL_SIZE = 8
+RECOGNIZER_POOL = asyncio.LifoQueue()
+if model:
+    for _ in range(RECOGNIZER_POOL_SIZE):
+        recognizer = KaldiRecognizer(model, 16000)
+        # Pre-warm: push 0.1 s of silence through so decoder buffers are allocated now.
+        recognizer.AcceptWaveform(bytes(3200))
+        recognizer.Reset()
+        RECOGNIZER_POOL.put_nowait(recognizer)
+
+KEYWORD_TAGS = frozenset({"NOUN", "PROPN", "VERB"})
+
+# One newmm tokenizer reused for every request instead of going through word_tokenize's dispatch.
+TOKENIZER = Tokenizer(engine="newmm")
+
+# Warm up PyThaiNLP's lazily-built newmm trie and POS model so the first request doesn't pay for it.
+pos_tag(TOKENIZER.word_tokenize("เริ่ม"), engine="perceptron", corpus="orchid_ud")
+
 app = FastAPI(
     title="Whisper Works API",
     description="Backend service with NLP capabilities, powered by AIS 5G & Edge Compute.",
     version="1.1.0"
 )
 
+@lru_cache(maxsize=1024)
+def _extract_keywords_cached(text: str) -> tuple[str, ...]:
+    pos_tags = pos_tag(TOKENIZER.word_tokenize(text), engine="perceptron", corpus="orchid_ud")
+    return tuple(word for word, tag in pos_tags if tag in KEYWORD_TAGS)
+
 def extract_keywords(text: str) -> list[str]:
     if not text:
         return []
     
-    words = word_tokenize(text, engine="newmm")
-    pos_tags = pos_tag(words, engine="orchid_ud")
-    keyword_tags = {"NOUN", "PROPN", "VERB"}
-    keywords = [word for word, tag in pos_tags if tag in keyword_tags]
-    
-    return keywords
+    return list(_extract_keywords_cached(text))
+
+@app.get("/stats")
+async def stats():
+    info = _extract_keywords_cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "keyword_cache": {
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": info.hits / lookups if lookups else 0.0,
+            "size": info.currsize,
+            "maxsize": info.maxsize
+        }
+    }
+
+def _decode_to_pcm(audio_data: bytes, audio_format: str) -> bytes:
+    # Blocking (pydub shells out to ffmpeg); run it in the threadpool.
+    return (
+        AudioSegment.from_file(io.BytesIO(audio_data), format=audio_format)
+        .set_frame_rate(16000)
+        .set_channels(1)
+        .set_sample_width(2)
+        .raw_data
+    )
+
+async def _recognize(recognizer: KaldiRecognizer, audio_file: UploadFile, audio_format: Optional[str]) -> str:
+    if audio_format and audio_format.lower() not in ("pcm", "raw"):
+        # Compressed/container formats need decoding to 16 kHz mono 16-bit PCM first.
+        audio_data = await audio_file.read()
+        try:
+            pcm_data = await run_in_threadpool(_decode_to_pcm, audio_data, audio_format.lower())
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not process audio file: {e}")
+        await run_in_threadpool(recognizer.AcceptWaveform, pcm_data)
+    else:
+        # Raw PCM goes straight to Vosk, which is built for streamed input.
+        while chunk := await audio_file.read(CHUNK_SIZE):
+            await run_in_threadpool(recognizer.AcceptWaveform, chunk)
+
+    return await run_in_threadpool(recognizer.FinalResult)
 
 @app.post("/transcribe")
-async def transcribe_audio(audio_file: UploadFile = File(...)):
+async def transcribe_audio(
+    audio_file: UploadFile = File(...),
+    audio_format: Optional[str] = Query(None, alias="format")
+):
     if not model:
         raise HTTPException(status_code=503, detail="AI Model is not available.")
 
     print(f"Processing file: '{audio_file.filename}'...")
-    audio_data = await audio_file.read()
-
+    recognizer = await RECOGNIZER_POOL.get()
     try:
-        # pydub can read raw PCM if we specify the parameters
-        audio_segment = AudioSegment(
-            data=audio_data,
-            sample_width=2, # 16-bit PCM
-            frame_rate=16000,
-            channels=1
-        )
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Could not process audio file: {e}")
-    
-    pcm_data = audio_segment.raw_data
-    recognizer = KaldiRecognizer(model, 16000)
-    recognizer.AcceptWaveform(pcm_data)
-    result_json = recognizer.FinalResult()
-    
-    result_dict = json.loads(result_json)
+        result_json = await _recognize(recognizer, audio_file, audio_format)
+    finally:
+        recognizer.Reset()
+        RECOGNIZER_POOL.put_nowait(recognizer)
+
+    result_dict = json_loads(result_json)
     transcribed_text = result_dict.get("text", "")
 
-    keywords = extract_keywords(transcribed_text)
+    keywords = await run_in_threadpool(extract_keywords, transcribed_text)
     
     print(f"Full Transcription: '{transcribed_text}'")
     print(f"Extracted Keywords: {keywords}")
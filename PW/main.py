@@ -7,32 +7,68 @@ Enhanced version with better error handling, logging, and performance optimizati
 import asyncio
 import json
 import logging
+import queue
+import re
+import shutil
+import tempfile
 import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-import traceback
+from typing import List, Optional, Dict, Any, AsyncIterator
 
 import uvicorn
 from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from vosk import Model, KaldiRecognizer
-from pydub import AudioSegment
-from pythainlp.tokenize import word_tokenize
+from pythainlp.corpus.common import thai_words
+from pythainlp.tokenize import Tokenizer
 from pythainlp.tag import pos_tag
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('whisperworks.log'),
-        logging.StreamHandler()
-    ]
-)
+# Prefer orjson's C parser for recognizer results when it is installed.
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Configure logging: request code only enqueues records; the file and console handlers
+# live on a listener thread that lifespan starts and stops.
+# `python main.py` imports this module twice (as __main__, then as main via uvicorn.run),
+# so reuse the root QueueHandler if a previous copy attached one: both copies then share
+# one queue, drained by the listener of whichever copy runs the lifespan.
+class DeferredFormatQueueHandler(QueueHandler):
+    """
+    QueueHandler that enqueues records as-is.
+
+    The stock prepare() formats the message and any traceback on the logging
+    thread; the listener runs in this process, so its handlers can do that
+    work off the request path instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+log_queue_handler = next((h for h in logging.getLogger().handlers if isinstance(h, QueueHandler)), None)
+if log_queue_handler is None:
+    log_queue_handler = DeferredFormatQueueHandler(queue.SimpleQueue())
+    logging.getLogger().setLevel(logging.INFO)
+    logging.getLogger().addHandler(log_queue_handler)
+log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+log_handlers = [
+    # delay: the copy whose listener never starts never opens the file
+    RotatingFileHandler('whisperworks.log', maxBytes=50 * 1024 * 1024, backupCount=5, delay=True),
+    logging.StreamHandler()
+]
+for handler in log_handlers:
+    handler.setFormatter(log_formatter)
+log_listener = QueueListener(log_queue_handler.queue, *log_handlers)
 logger = logging.getLogger(__name__)
 
 # Global variables
@@ -41,10 +77,26 @@ MODEL_PATH = "model-th"
 SUPPORTED_LANGUAGES = ["th", "en"]
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 ALLOWED_AUDIO_FORMATS = {'.wav', '.pcm', '.mp3', '.m4a', '.ogg', '.flac'}
+SAMPLE_RATE = 16000
+PCM_CHUNK_SIZE = 64 * 1024  # bytes read from the upload and fed per AcceptWaveform call (~2 s of audio)
+# MP4 recorders (Android MediaRecorder, iOS) write the moov atom after the audio data, which
+# ffmpeg can only demux from a seekable input, so these go through a temp file instead of a pipe
+SEEKABLE_INPUT_FORMATS = {'.m4a'}
 
 # Performance settings
 RECOGNIZER_POOL_SIZE = 3
-recognizer_pool = []
+recognizer_pool: Optional[asyncio.Queue] = None
+# Kaldi releases the GIL while decoding, so one thread per recognizer decodes in parallel
+decode_pool: Optional[ThreadPoolExecutor] = None
+
+# NLP settings: the dictionary trie is built once here, not looked up per request
+THAI_TOKENIZER = Tokenizer(custom_dict=thai_words(), engine="newmm")
+POS_ENGINE = "perceptron"
+POS_CORPUS = "orchid_ud"  # ORCHID model with Universal Dependencies tags (NOUN, VERB, ...)
+# Include more POS tags for better keyword extraction
+THAI_KEYWORD_TAGS = frozenset({"NOUN", "PROPN", "VERB", "ADJ"})
+ENGLISH_STOP_WORDS = frozenset({"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"})
+ENGLISH_WORD_RE = re.compile(r"[A-Za-z']{4,}")  # tokenizes and drops words of 3 letters or fewer in one pass
 
 class ServerConfig:
     """Server configuration"""
@@ -106,7 +158,7 @@ async def load_model():
     global model, recognizer_pool
     
     try:
-        logger.info(f"Loading Vosk model from {MODEL_PATH}...")
+        logger.info("Loading Vosk model from %s...", MODEL_PATH)
         
         model_path = Path(MODEL_PATH)
         if not model_path.exists():
@@ -114,82 +166,74 @@ async def load_model():
         
         model = Model(str(model_path))
         
-        # Initialize recognizer pool
-        recognizer_pool = [
-            KaldiRecognizer(model, 16000) 
-            for _ in range(RECOGNIZER_POOL_SIZE)
-        ]
+        # Initialize recognizer pool (fixed size; requests wait when all are busy)
+        recognizer_pool = asyncio.Queue(maxsize=RECOGNIZER_POOL_SIZE)
+        for _ in range(RECOGNIZER_POOL_SIZE):
+            await recognizer_pool.put(KaldiRecognizer(model, SAMPLE_RATE))
         
         app_state["model_loaded"] = True
         logger.info("✅ Vosk model for Thai language loaded successfully")
-        logger.info(f"Created {len(recognizer_pool)} recognizers in pool")
+        logger.info("Created %d recognizers in pool", recognizer_pool.qsize())
         
     except Exception as e:
-        logger.error(f"❌ Error loading Vosk model: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("❌ Error loading Vosk model: %s", e)
         app_state["model_loaded"] = False
         raise
 
-def get_recognizer() -> KaldiRecognizer:
-    """Get a recognizer from the pool"""
-    if not recognizer_pool:
-        if not model:
-            raise HTTPException(status_code=503, detail="AI Model is not available")
-        return KaldiRecognizer(model, 16000)
+@asynccontextmanager
+async def acquire_recognizer() -> AsyncIterator[KaldiRecognizer]:
+    """Borrow a recognizer from the pool for exclusive use, waiting if none is free"""
+    if recognizer_pool is None:
+        raise HTTPException(status_code=503, detail="AI Model is not available")
     
-    recognizer = recognizer_pool.pop()
-    # Reset recognizer state
-    recognizer.Reset()
-    return recognizer
-
-def return_recognizer(recognizer: KaldiRecognizer):
-    """Return a recognizer to the pool"""
-    if len(recognizer_pool) < RECOGNIZER_POOL_SIZE:
-        recognizer_pool.append(recognizer)
+    recognizer = await recognizer_pool.get()
+    try:
+        yield recognizer
+    finally:
+        # Reset recognizer state before the next request gets it
+        recognizer.Reset()
+        recognizer_pool.put_nowait(recognizer)
 
+@lru_cache(maxsize=4096)
+def _extract_keywords_cached(text: str, language: str) -> tuple[str, ...]:
+    """Keyword extraction proper; cached because short utterances recur across sessions"""
+    if language == "th":
+        # Thai language processing
+        words = THAI_TOKENIZER.word_tokenize(text)
+        pos_tags = pos_tag(words, engine=POS_ENGINE, corpus=POS_CORPUS)
+        
+        # Filter by tag and dedup (case-insensitively, keeping first spelling and order) in one pass
+        keywords = {}
+        for word, tag in pos_tags:
+            if tag in THAI_KEYWORD_TAGS and len(word := word.strip()) > 1:
+                keywords.setdefault(word.lower(), word)
+                
+        return tuple(keywords.values())[:10]  # Limit to top 10 keywords
+        
+    else:
+        # Simple English keyword extraction: stop words filtered, deduped in order of appearance
+        words = ENGLISH_WORD_RE.findall(text.lower())
+        return tuple(dict.fromkeys(word for word in words if word not in ENGLISH_STOP_WORDS))[:10]
+        
 def extract_keywords(text: str, language: str = "th") -> List[str]:
     """Extract keywords from text with improved algorithm"""
     if not text.strip():
         return []
     
     try:
-        if language == "th":
-            # Thai language processing
-            words = word_tokenize(text, engine="newmm")
-            pos_tags = pos_tag(words, engine="orchid_ud")
-            
-            # Include more POS tags for better keyword extraction
-            keyword_tags = {"NOUN", "PROPN", "VERB", "ADJ"}
-            keywords = []
-            
-            for word, tag in pos_tags:
-                if tag in keyword_tags and len(word.strip()) > 1:
-                    keywords.append(word.strip())
-            
-            # Remove duplicates while preserving order
-            seen = set()
-            unique_keywords = []
-            for keyword in keywords:
-                if keyword.lower() not in seen:
-                    seen.add(keyword.lower())
-                    unique_keywords.append(keyword)
-                    
-            return unique_keywords[:10]  # Limit to top 10 keywords
-            
-        else:
-            # Simple English keyword extraction
-            words = text.split()
-            # Filter out common stop words and short words
-            stop_words = {"the", "a", "an", "and", "or", "but", "in", "on", "at", "to", "for", "of", "with", "by"}
-            keywords = [word for word in words 
-                       if len(word) > 3 and word.lower() not in stop_words]
-            return list(set(keywords))[:10]
-            
+        return list(_extract_keywords_cached(text, language))
     except Exception as e:
-        logger.warning(f"Keyword extraction failed: {e}")
+        logger.warning("Keyword extraction failed: %s", e)
         # Fallback to simple word splitting
         return text.split()[:10]
 
+def warm_up_nlp() -> None:
+    """Load the POS tagger model now so the first Thai request doesn't pay for it"""
+    try:
+        pos_tag(THAI_TOKENIZER.word_tokenize("เริ่มประชุม"), engine=POS_ENGINE, corpus=POS_CORPUS)
+    except Exception as e:
+        logger.warning("NLP warm-up failed: %s", e)
+
 def validate_audio_file(file: UploadFile) -> None:
     """Validate uploaded audio file"""
     # Check file size
@@ -208,47 +252,166 @@ def validate_audio_file(file: UploadFile) -> None:
                 detail=f"Unsupported file format. Supported: {', '.join(ALLOWED_AUDIO_FORMATS)}"
             )
 
-async def process_audio_segment(audio_data: bytes, language: str = "th") -> dict:
-    """Process audio data and return transcription"""
-    recognizer = None
+async def _read_upload_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """Yield the upload in PCM_CHUNK_SIZE pieces without reading it all into memory"""
+    while chunk := await file.read(PCM_CHUNK_SIZE):
+        yield chunk
+
+def _spool_upload_to_disk(file: UploadFile, suffix: str) -> str:
+    """Blocking: copy the upload to a named temp file ffmpeg can seek in and return its path"""
+    tmp = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        with tmp:
+            shutil.copyfileobj(file.file, tmp, PCM_CHUNK_SIZE)
+    except BaseException:
+        Path(tmp.name).unlink(missing_ok=True)
+        raise
+    return tmp.name
+
+async def _ffmpeg_pcm_chunks(file: UploadFile, suffix: str) -> AsyncIterator[bytes]:
+    """
+    Decode a compressed upload to 16 kHz mono s16le with ffmpeg.
+
+    The upload is piped into ffmpeg's stdin, except for SEEKABLE_INPUT_FORMATS,
+    which are copied to a temp file first so ffmpeg can seek in them.
+    """
+    input_path = None
+    if suffix in SEEKABLE_INPUT_FORMATS:
+        input_path = await run_in_threadpool(_spool_upload_to_disk, file, suffix)
+    try:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-loglevel", "error", "-i", input_path or "pipe:0",
+                "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "pipe:1",
+                stdin=asyncio.subprocess.PIPE if input_path is None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=415,
+                detail="Decoding this format needs ffmpeg, which is not installed on the server; upload 16 kHz mono 16-bit WAV or raw PCM instead"
+            )
+
+        async def feed_stdin():
+            try:
+                async for chunk in _read_upload_chunks(file):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg exited early; its return code reports the failure
+            finally:
+                process.stdin.close()
+
+        feeder = asyncio.create_task(feed_stdin()) if input_path is None else None
+        try:
+            while chunk := await process.stdout.read(PCM_CHUNK_SIZE):
+                yield chunk
+            if feeder is not None:
+                await feeder
+            if await process.wait() != 0:
+                raise HTTPException(status_code=400, detail="Could not decode audio file")
+        finally:
+            if feeder is not None:
+                feeder.cancel()
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+    finally:
+        if input_path is not None:
+            Path(input_path).unlink(missing_ok=True)
+
+def _open_pcm_wav(file: UploadFile) -> Optional[wave.Wave_read]:
+    """Open a WAV upload if it is already 16 kHz mono 16-bit PCM, else return None"""
+    try:
+        wav = wave.open(file.file, "rb")
+    except (wave.Error, EOFError):
+        return None
+    if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+        return None
+    return wav
+
+async def iter_pcm_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+    """
+    Yield 16 kHz mono 16-bit PCM from an upload.
+
+    Raw .pcm uploads pass straight through, WAV files that are already
+    16 kHz mono 16-bit only have their header skipped, and everything else
+    (the other ALLOWED_AUDIO_FORMATS) is decoded by ffmpeg.
+    """
+    suffix = Path(file.filename or "").suffix.lower()
+
+    if suffix == ".pcm":
+        async for chunk in _read_upload_chunks(file):
+            yield chunk
+        return
+
+    if suffix == ".wav":
+        # wave reads the (possibly disk-spooled) upload synchronously, so keep it off the event loop
+        wav = await run_in_threadpool(_open_pcm_wav, file)
+        if wav is not None:
+            while frames := await run_in_threadpool(wav.readframes, PCM_CHUNK_SIZE // 2):
+                yield frames
+            return
+        await file.seek(0)
+
+    async for chunk in _ffmpeg_pcm_chunks(file, suffix):
+        yield chunk
+
+def _finish_sync(recognizer: KaldiRecognizer) -> dict:
+    """Blocking: flush the recognizer and return the parsed final result (runs on decode_pool)"""
+    return json_loads(recognizer.FinalResult())
+
+async def process_audio_segment(pcm_chunks: AsyncIterator[bytes], language: str = "th") -> dict:
+    """Stream 16 kHz mono 16-bit PCM chunks into the recognizer and return transcription"""
     processing_start = time.time()
+    loop = asyncio.get_running_loop()
     
     try:
-        recognizer = get_recognizer()
-        
-        # Convert raw PCM to AudioSegment
-        audio_segment = AudioSegment(
-            data=audio_data,
-            sample_width=2,  # 16-bit PCM
-            frame_rate=16000,
-            channels=1
-        )
-        
-        # Get raw PCM data
-        pcm_data = audio_segment.raw_data
-        
-        # Process in chunks for better memory management
-        chunk_size = 4096
-        for i in range(0, len(pcm_data), chunk_size):
-            chunk = pcm_data[i:i + chunk_size]
-            recognizer.AcceptWaveform(chunk)
-        
-        # Get final result
-        result_json = recognizer.FinalResult()
-        result_dict = json.loads(result_json)
+        async with acquire_recognizer() as recognizer:
+            audio_bytes = 0
+            # Decode of the previous chunk runs on decode_pool while the next one is read
+            decoding = None
+            try:
+                async for chunk in pcm_chunks:
+                    audio_bytes += len(chunk)
+                    if decoding is not None:
+                        await asyncio.wrap_future(decoding)
+                    # Chunks arrive as bytes, which is all Vosk's cffi binding (`const char *`)
+                    # accepts, so they go to Kaldi without slicing or copying
+                    decoding = decode_pool.submit(recognizer.AcceptWaveform, chunk)
+                if decoding is not None:
+                    await asyncio.wrap_future(decoding)
+            finally:
+                # Never hand the recognizer back to the pool while a decode thread still uses it
+                if decoding is not None and not decoding.done():
+                    await asyncio.wait([asyncio.wrap_future(decoding)])
+            
+            if audio_bytes == 0:
+                raise HTTPException(status_code=400, detail="Audio file is empty")
+            
+            # Get final result; as above, if cancelled (client disconnect, shutdown) wait for
+            # FinalResult to finish before the recognizer is reset and returned to the pool
+            finishing = decode_pool.submit(_finish_sync, recognizer)
+            try:
+                result_dict = await asyncio.wrap_future(finishing)
+            finally:
+                if not finishing.done():
+                    await asyncio.wait([asyncio.wrap_future(finishing)])
         
         transcribed_text = result_dict.get("text", "").strip()
         confidence = result_dict.get("conf", 0.0)
         
-        # Extract keywords
-        keywords = extract_keywords(transcribed_text, language)
+        # Extract keywords; POS tagging blocks, so keep it off the event loop
+        # (default executor, so it never queues behind Kaldi decodes)
+        keywords = await loop.run_in_executor(None, extract_keywords, transcribed_text, language)
         
         processing_time = time.time() - processing_start
         
-        logger.info(f"Transcription completed in {processing_time:.2f}s")
-        logger.info(f"Text: '{transcribed_text}'")
-        logger.info(f"Keywords: {keywords}")
-        logger.info(f"Confidence: {confidence}")
+        logger.info("Transcription completed in %.2fs (%d bytes of PCM)", processing_time, audio_bytes)
+        logger.info("Text: '%s'", transcribed_text)
+        logger.info("Keywords: %s", keywords)
+        logger.info("Confidence: %s", confidence)
         
         return {
             "full_text": transcribed_text,
@@ -259,33 +422,41 @@ async def process_audio_segment(audio_data: bytes, language: str = "th") -> dict
             "word_count": len(transcribed_text.split()) if transcribed_text else 0
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Audio processing failed: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("Audio processing failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
-    
-    finally:
-        if recognizer:
-            return_recognizer(recognizer)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
+    global decode_pool
+    
     # Startup
+    # Records logged before this point (e.g. at import) wait in the queue and are written now
+    log_listener.start()
     logger.info("🚀 Starting WhisperWorks API server...")
+    # Sized to the recognizer pool so decode work never queues behind a busy thread
+    decode_pool = ThreadPoolExecutor(max_workers=RECOGNIZER_POOL_SIZE, thread_name_prefix="kaldi-decode")
+    if shutil.which("ffmpeg") is None:
+        logger.warning("ffmpeg not found on PATH; only 16 kHz mono WAV and raw PCM uploads can be transcribed")
     try:
         await load_model()
+        await asyncio.get_running_loop().run_in_executor(None, warm_up_nlp)
         logger.info("✅ Server startup completed successfully")
     except Exception as e:
-        logger.error(f"❌ Server startup failed: {e}")
+        logger.error("❌ Server startup failed: %s", e)
+        log_listener.stop()
         raise
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down WhisperWorks API server...")
-    # Cleanup code here if needed
+    decode_pool.shutdown(wait=True)
     logger.info("✅ Server shutdown completed")
+    log_listener.stop()  # flushes queued records
 
 # Create FastAPI app
 app = FastAPI(
@@ -306,7 +477,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# No in-app GZip: transcription responses are a few KB, and compressing them would run
+# zlib on the event loop for every response. Leave compression to the fronting proxy.
 
 # Request counter middleware
 @app.middleware("http")
@@ -383,23 +555,17 @@ async def transcribe_audio(
             detail=f"Unsupported language: {language}. Supported: {SUPPORTED_LANGUAGES}"
         )
     
-    logger.info(f"Processing transcription request for file: '{audio_file.filename}' (language: {language})")
+    logger.info("Processing transcription request for file: '%s' (language: %s)", audio_file.filename, language)
     
     try:
-        # Read audio data
-        audio_data = await audio_file.read()
-        
-        if len(audio_data) == 0:
-            raise HTTPException(status_code=400, detail="Audio file is empty")
-        
-        logger.info(f"Audio file size: {len(audio_data)} bytes")
+        logger.info("Audio file size: %s bytes", audio_file.size)
         
-        # Process audio
-        result = await process_audio_segment(audio_data, language)
+        # Process audio (streamed from the upload, never fully buffered)
+        result = await process_audio_segment(iter_pcm_chunks(audio_file), language)
         
         # Filter by confidence threshold if specified
         if confidence_threshold > 0 and result.get("confidence", 0) < confidence_threshold:
-            logger.warning(f"Transcription confidence {result.get('confidence', 0)} below threshold {confidence_threshold}")
+            logger.warning("Transcription confidence %s below threshold %s", result.get('confidence', 0), confidence_threshold)
         
         # Create response
         response = TranscriptionResponse(**result)
@@ -413,8 +579,7 @@ async def transcribe_audio(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Transcription request failed: {e}")
-        logger.error(traceback.format_exc())
+        logger.exception("❌ Transcription request failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 async def cleanup_temp_files():
@@ -423,13 +588,12 @@ async def cleanup_temp_files():
         # Add cleanup logic here if needed
         pass
     except Exception as e:
-        logger.warning(f"Cleanup task failed: {e}")
+        logger.warning("Cleanup task failed: %s", e)
 
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {exc}")
-    logger.error(traceback.format_exc())
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
     
     return JSONResponse(
         status_code=500,
@@ -1,8 +1,35 @@
 import speech_recognition as sr
+import json
 import os
+import sys
 import time
+from array import array
 from collections import deque
 
+# (ทางเลือก) Aho-Corasick สำหรับหาคำฟุ่มเฟือยและ Keyword ทั้งหมดในรอบเดียว
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except Exception:
+    HAS_AHOCORASICK = False
+
+# (ทางเลือก) httpx: ใช้ connection ไป Google STT ซ้ำ (keep-alive) แทนการเปิดใหม่ทุกประโยค
+try:
+    import httpx
+    HAS_HTTPX = True
+except Exception:
+    HAS_HTTPX = False
+
+# (ทางเลือก) h2: ให้ httpx คุยกับ Google STT แบบ HTTP/2 (pip install httpx[http2])
+try:
+    import h2
+    HAS_HTTP2 = True
+except Exception:
+    HAS_HTTP2 = False
+
+# endpoint เดียวกับที่ recognize_google ของ SpeechRecognition ใช้ แต่ผ่าน https
+GOOGLE_STT_ENDPOINT = "https://www.google.com/speech-api/v2/recognize"
+
 class RealTimeAugmenter:
     """
     คลาสสำหรับจัดการ Real-time Augmenter ทั้งหมด
@@ -11,7 +38,8 @@ class RealTimeAugmenter:
     # --- 1. การตั้งค่า (Configuration) ---
     def __init__(self):
         # ตั้งค่าการวิเคราะห์
-        self.FILLER_WORDS = ["เอ่อ", "อ่า", "แบบว่า", "คือว่า", "ก็คือ", "แบบ"]
+        filler_words = ["เอ่อ", "อ่า", "แบบว่า", "คือว่า", "ก็คือ", "แบบ"]
+        self.FILLER_WORDS = frozenset(filler_words)
         self.KEYWORD_TRIGGERS = {
             "ราคา": "ข้อมูลสำคัญ: ราคาเริ่มต้นที่ 50,000 บาท พร้อมโปรโมชั่นลด 10%",
             "คู่แข่ง": "ข้อมูลสำคัญ: คู่แข่งหลักคือบริษัท A และ B จุดแข็งของเราคือบริการหลังการขาย",
@@ -23,52 +51,79 @@ class RealTimeAugmenter:
         self.PACING_WINDOW_SECONDS = 5
         
         # ตัวแปรสถานะ (State)
-        self.filler_word_counts = {word: 0 for word in self.FILLER_WORDS}
+        # ตัวนับคำฟุ่มเฟือยแบบ SoA: ลำดับคำ (สำหรับหน้าจอ) + ตัวนับ int64 ตาม index + ยอดรวมสะสม
+        self._filler_words = tuple(filler_words)
+        self._filler_idx = {word: i for i, word in enumerate(filler_words)}
+        self._filler_counts = array('q', [0] * len(filler_words))
+        self.total_fillers = 0
         self.pacing_word_count = 0
         self.pacing_start_time = time.time()
         self.spoken_text_history = set()
         self.live_transcript = deque(maxlen=3) # เก็บประโยคล่าสุด 3 ประโยค
         self.triggered_keywords_log = deque(maxlen=5) # เก็บ Keyword ที่เจอ 5 รายการล่าสุด
 
+        # สร้าง automaton ครั้งเดียว: สแกนข้อความรอบเดียวได้ทั้งคำฟุ่มเฟือยและ Keyword
+        self._automaton = self._build_automaton() if HAS_AHOCORASICK else None
+
         # ตั้งค่า Speech Recognition
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         # *ปรับค่าเพื่อให้ตอบสนองเร็วขึ้น*
         self.recognizer.pause_threshold = 0.6      # ลดเวลาที่รอหลังพูดจบ (ค่าปกติ 0.😎
         self.recognizer.non_speaking_duration = 0.4 # ลดความเงียบที่ต้องมีก่อนเริ่มพูด (ค่าปกติ 0.5)
+        # key ของตัวเองผ่าน env var ตัวเดียวกับ meeting_realtime
+        self.google_key = os.environ.get("GOOGLE_SPEECH_RECOGNITION_API_KEY")
 
-    def _clear_screen(self):
-        """ล้างหน้าจอ Terminal"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        # HTTP client ตัวเดียวตลอดการทำงาน (callback ถูกเรียกทีละครั้งจาก thread ของ listener)
+        # ใช้เฉพาะเมื่อตั้ง key ไว้ ถ้าไม่ตั้งจะใช้ recognize_google ซึ่งมี key สาธารณะของไลบรารีเอง
+        self._http = None
+        if HAS_HTTPX and self.google_key:
+            self._http = httpx.Client(http2=HAS_HTTP2, timeout=10, limits=httpx.Limits(max_keepalive_connections=2))
+
+        if os.name == 'nt':
+            os.system("")  # เปิดโหมด ANSI (VT100) ของ Windows console
+
+    def _build_automaton(self):
+        # คำเดียวกันอาจเป็นทั้งคำฟุ่มเฟือยและ Keyword จึงเก็บค่าเป็น tuple ของชนิด
+        kinds = {}
+        for word in self.FILLER_WORDS:
+            kinds.setdefault(word, []).append("filler")
+        for keyword in self.KEYWORD_TRIGGERS:
+            kinds.setdefault(keyword, []).append("kw")
+        automaton = ahocorasick.Automaton()
+        for word, word_kinds in kinds.items():
+            automaton.add_word(word, (tuple(word_kinds), word))
+        automaton.make_automaton()
+        return automaton
 
     def _display_dashboard(self):
         """แสดงผลข้อมูลทั้งหมดบนหน้าจอ"""
-        self._clear_screen()
-        print("="*60)
-        print("--- 🚀 The Pro Co-pilot: Real-time Augmenter 🚀 ---")
-        print("สถานะ: กำลังรับฟัง... (กด Ctrl+C เพื่อหยุด)")
-        print("="*60)
+        lines = [
+            "="*60,
+            "--- 🚀 The Pro Co-pilot: Real-time Augmenter 🚀 ---",
+            "สถานะ: กำลังรับฟัง... (กด Ctrl+C เพื่อหยุด)",
+            "="*60,
+        ]
 
         # --- Live Transcript ---
-        print("\n📜 Live Transcript (สิ่งที่คุณพูดล่าสุด):")
+        lines += ["", "📜 Live Transcript (สิ่งที่คุณพูดล่าสุด):"]
         if not self.live_transcript:
-            print("   ...")
+            lines.append("   ...")
         else:
-            for i, text in enumerate(self.live_transcript):
-                print(f"   - {text}")
+            for text in self.live_transcript:
+                lines.append(f"   - {text}")
         
         # --- Filler Word Counter ---
-        print("\n📊 ตัวนับคำฟุ่มเฟือย (Filler Words):")
-        total_fillers = sum(self.filler_word_counts.values())
-        if total_fillers > 0:
-            for word, count in self.filler_word_counts.items():
+        lines += ["", "📊 ตัวนับคำฟุ่มเฟือย (Filler Words):"]
+        if self.total_fillers > 0:
+            for word, count in zip(self._filler_words, self._filler_counts):
                 if count > 0:
-                    print(f"   - {word}: {count} ครั้ง")
+                    lines.append(f"   - {word}: {count} ครั้ง")
         else:
-            print("   ยอดเยี่ยม! ยังไม่พบคำฟุ่มเฟือย")
+            lines.append("   ยอดเยี่ยม! ยังไม่พบคำฟุ่มเฟือย")
             
         # --- Pacing Feedback ---
-        print("\n🏃‍♂️ ความเร็วในการพูด (Pacing):")
+        lines += ["", "🏃‍♂️ ความเร็วในการพูด (Pacing):"]
         elapsed_time = time.time() - self.pacing_start_time
         if elapsed_time > 1 and self.pacing_word_count > 0:
             wpm = (self.pacing_word_count / elapsed_time) * 60
@@ -77,19 +132,23 @@ class RealTimeAugmenter:
                 feedback = "🐢 ช้าไป"
             elif wpm > self.WPM_FAST_THRESHOLD:
                 feedback = "🚀 เร็วไป"
-            print(f"   ปัจจุบัน: {int(wpm)} WPM ({feedback})")
+            lines.append(f"   ปัจจุบัน: {int(wpm)} WPM ({feedback})")
         else:
-            print("   กำลังรอข้อมูล...")
+            lines.append("   กำลังรอข้อมูล...")
 
         # --- Keyword Trigger Log ---
-        print("\n🔔 Keyword ที่ตรวจพบ:")
+        lines += ["", "🔔 Keyword ที่ตรวจพบ:"]
         if not self.triggered_keywords_log:
-            print("   ยังไม่พบ Keyword ที่ตั้งค่าไว้")
+            lines.append("   ยังไม่พบ Keyword ที่ตั้งค่าไว้")
         else:
-             for log in self.triggered_keywords_log:
-                print(log)
+            lines.extend(self.triggered_keywords_log)
+
+        lines += ["", "-"*60]
 
-        print("\n"+"-"*60)
+        # ANSI: กลับไปมุมซ้ายบน, เขียนทับทีละบรรทัด (ล้างท้ายบรรทัด) แล้วล้างส่วนที่เหลือของจอ
+        # เขียนทั้งเฟรมในครั้งเดียว แทนการเรียก cls/clear (fork process) + print ทีละบรรทัด
+        sys.stdout.write("\x1b[H" + "".join(f"{line}\x1b[K\n" for line in lines) + "\x1b[J")
+        sys.stdout.flush()
 
     def _process_text(self, text):
         """วิเคราะห์ข้อความที่ได้รับมาใหม่"""
@@ -99,25 +158,81 @@ class RealTimeAugmenter:
 
         self.live_transcript.append(text)
         
-        # 1. นับคำฟุ่มเฟือย
-        for word in words:
-            if word in self.FILLER_WORDS:
-                self.filler_word_counts[word] += 1
-        
         # 2. เพิ่มจำนวนคำสำหรับคำนวณความเร็ว
         self.pacing_word_count += len(words)
 
+        if self._automaton is not None:
+            # 1+3. สแกนรอบเดียวได้ทั้งคำฟุ่มเฟือยและ Keyword
+            last = len(text) - 1
+            for end, (kinds, word) in self._automaton.iter(text):
+                if "filler" in kinds:
+                    # นับเฉพาะเมื่อเป็นคำเต็ม (คั่นด้วยช่องว่าง) เหมือนการเทียบทีละคำ
+                    start = end - len(word) + 1
+                    if (start == 0 or text[start - 1].isspace()) and (end == last or text[end + 1].isspace()):
+                        self._filler_counts[self._filler_idx[word]] += 1
+                        self.total_fillers += 1
+                if "kw" in kinds:
+                    self._log_keyword(word)
+            return
+
+        # 1. นับคำฟุ่มเฟือย
+        filler_idx = self._filler_idx
+        for word in words:
+            i = filler_idx.get(word)
+            if i is not None:
+                self._filler_counts[i] += 1
+                self.total_fillers += 1
+
         # 3. ตรวจจับ Keyword
-        for keyword, info in self.KEYWORD_TRIGGERS.items():
-            if keyword in text and keyword not in self.spoken_text_history:
-                log_message = f"   🎯 '{keyword}': {info}"
-                self.triggered_keywords_log.append(log_message)
-                self.spoken_text_history.add(keyword)
+        for keyword in self.KEYWORD_TRIGGERS:
+            if keyword in text:
+                self._log_keyword(keyword)
+
+    def _log_keyword(self, keyword):
+        """บันทึก Keyword ที่เจอครั้งแรก"""
+        if keyword not in self.spoken_text_history:
+            log_message = f"   🎯 '{keyword}': {self.KEYWORD_TRIGGERS[keyword]}"
+            self.triggered_keywords_log.append(log_message)
+            self.spoken_text_history.add(keyword)
+
+    def _recognize_google(self, audio):
+        """ส่งเสียงไป Google STT ผ่าน connection เดิม (คำขอ/คำตอบรูปแบบเดียวกับ recognize_google)"""
+        # สำเนาเดียวกับ Meeting_AIWord_detect/meeting_realtime.py::_recognize_google แก้ที่หนึ่งต้องแก้อีกที่ด้วย
+        flac_data = audio.get_flac_data(
+            convert_rate=None if audio.sample_rate >= 8000 else 8000,
+            convert_width=2 # ต้องเป็น 16-bit
+        )
+        try:
+            response = self._http.post(
+                GOOGLE_STT_ENDPOINT,
+                params={"client": "chromium", "lang": "th-TH", "key": self.google_key, "pFilter": 0},
+                headers={"Content-Type": f"audio/x-flac; rate={audio.sample_rate}"},
+                content=flac_data
+            )
+        except (httpx.HTTPError, RuntimeError) as e: # RuntimeError: client ถูกปิดไปแล้วตอนหยุดโปรแกรม
+            raise sr.RequestError(f"recognition connection failed: {e}")
+        if response.status_code != 200:
+            raise sr.RequestError(f"recognition request failed: {response.reason_phrase}")
+
+        # คำตอบเป็น JSON ทีละบรรทัด บรรทัดแรกมักเป็น {"result":[]} ว่างๆ
+        for line in response.text.split("\n"):
+            if not line:
+                continue
+            result = json.loads(line)["result"]
+            if result:
+                alternatives = result[0].get("alternative")
+                if not alternatives or "transcript" not in alternatives[0]:
+                    raise sr.UnknownValueError()
+                return alternatives[0]["transcript"]
+        raise sr.UnknownValueError()
 
     def _audio_callback(self, recognizer, audio):
         """ฟังก์ชันที่จะถูกเรียกใช้เมื่อตรวจจับเสียงพูดได้"""
         try:
-            text = recognizer.recognize_google(audio, language="th-TH")
+            if self._http is not None:
+                text = self._recognize_google(audio)
+            else:
+                text = recognizer.recognize_google(audio, language="th-TH", key=self.google_key)
             self._process_text(text)
         except sr.UnknownValueError:
             pass # ไม่ต้องทำอะไรถ้าไม่เข้าใจเสียง
@@ -146,6 +261,8 @@ class RealTimeAugmenter:
         except KeyboardInterrupt:
             print("\nกำลังหยุดการทำงาน...")
             stop_listening(wait_for_stop=False)
+            if self._http is not None:
+                self._http.close()
             print("ปิดโปรแกรมเรียบร้อย ขอบคุณที่ใช้งานครับ!")
 
 # --- ส่วนของการรันโปรแกรม ---